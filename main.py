@@ -19,39 +19,149 @@ import os
 import sys
 import shutil
 import json
-import xml.etree.ElementTree as ET
 import argparse
+import hashlib
 import re
+import sqlite3
 from pathlib import Path
 import logging
+import logging.handlers
+import queue
+import atexit
 from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
+from xml.sax.saxutils import escape, unescape
 
 # For translation
 try:
     from googletrans import Translator
+    # httpx e httpcore sono dipendenze di googletrans: servono per riconoscere gli errori di rete
+    import httpcore
+    import httpx
 except ImportError:
     print("Installa il pacchetto googletrans: pip install googletrans==4.0.0-rc1")
     sys.exit(1)
 
+# For XML parsing
+try:
+    from lxml import etree as ET
+except ImportError:
+    print("Installa il pacchetto lxml: pip install lxml")
+    sys.exit(1)
+
+# orjson è opzionale: se non è installato si usa il modulo json standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configurazione logging
+# Il FileHandler scrive da un thread dedicato tramite una coda, così la scrittura
+# del log su disco non blocca il ciclo di traduzione
+_log_queue = queue.Queue(-1)
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.FileHandler('xliff_translation.log'))
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(),
-        logging.FileHandler('xliff_translation.log')
+        logging.handlers.QueueHandler(_log_queue)
     ]
 )
 logger = logging.getLogger(__name__)
 
-# Registra namespaces per XML
-ET.register_namespace('', 'urn:oasis:names:tc:xliff:document:1.2')
-ET.register_namespace('xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-
 # Costanti
 FORMAT_SPECIFIER_PATTERN = re.compile(r'(%[@%diouxXfeEgGcs]|\{[^}]*\})')
-PLACEHOLDER_TEMPLATE = "PLACEHOLDERXYZ{}"
+# I segnaposto sono delimitati da caratteri Unicode ad uso privato: la traduzione automatica
+# li lascia intatti e nessun segnaposto è prefisso di un altro (es. 1 e 10)
+PLACEHOLDER_TEMPLATE = "\uE000{}\uE001"
+
+# Le traduzioni sono memorizzate nella cache per frase: il gruppo cattura gli spazi
+# tra le frasi, così il testo tradotto può essere ricomposto con la stessa spaziatura
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])(\s+)')
+
+# Testi che non richiedono traduzione: senza lettere (i segnaposto non ne contengono) o URL
+LETTER_PATTERN = re.compile(r'[^\W\d_]')
+IDENTITY_PATTERN = re.compile(r'https?://\S+')
+
+# Pattern per la correzione forzata dell'attributo target-language
+TARGET_LANGUAGE_PATTERN = re.compile(r'target-language="[^"]*"')
+
+# Pattern per la verifica della coerenza sui byte grezzi dei file XLIFF
+FILE_TAG_PATTERN = re.compile(rb'<(?:[\w.-]+:)?file\b[^>]*>')  # Anche con prefisso (es. <x:file>)
+TARGET_LANGUAGE_ATTR_PATTERN = re.compile(rb'\starget-language="([^"]*)"')
+ORIGINAL_ATTR_PATTERN = re.compile(rb'\soriginal="([^"]*)"')
+
+# Dichiarazioni di namespace che lxml serializza subito dopo il nome del tag di apertura
+START_TAG_NAMESPACES_PATTERN = re.compile(rb'<[^\s>/]+((?:\sxmlns(?::[^=\s]+)?="[^"]*")*)')
+NAMESPACE_DECLARATION_PATTERN = re.compile(rb'\sxmlns(?::([^=\s]+))?="([^"]*)"')
+
+# Parametri per le traduzioni in blocco
+# googletrans 4.0.0-rc1 accetta una sola stringa per chiamata: le stringhe di un blocco
+# vengono unite con un separatore di riga e tradotte con un'unica richiesta
+BATCH_SIZE = 50
+BATCH_MAX_CHARS = 4500  # Resta sotto il limite di ~5000 caratteri di Google Translate
+BATCH_SEPARATOR = "\n"
+WRITE_QUEUE_LIMIT = 1000  # Nodi accodati oltre i quali la coda di scrittura viene svuotata comunque
+
+# Limite di frequenza delle chiamate API e tentativi in caso di errore
+RATE_LIMIT_PER_SEC = 5
+RATE_LIMIT_BURST = 10
+RATE_LIMIT_PENALTY_SECONDS = 60  # Durata del rallentamento dopo una risposta 429
+MAX_RETRIES = 6  # Tentativi per ogni chiamata API, con attesa esponenziale (1s, 2s, 4s, ...)
+
+# Errori di rete temporanei per cui ha senso ritentare la chiamata API.
+# Gli altri errori (es. risposta non interpretabile per un testo) si ripeterebbero identici
+TRANSIENT_API_ERRORS = (
+    httpcore.NetworkError,  # Include ConnectError
+    httpcore.TimeoutException,
+    httpcore.ProtocolError,
+    httpx.HTTPError,
+)
+
+# Codice di stato HTTP nel messaggio di errore di googletrans ('Unexpected status code "429" from ...')
+STATUS_CODE_PATTERN = re.compile(r'status code "(\d{3})"')
+
+# Cache persistente delle traduzioni, condivisa tra esecuzioni successive
+# Cambiare la versione invalida tutte le voci salvate in precedenza
+PERSISTENT_CACHE_PATH = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'xliff_translator.db'
+PERSISTENT_CACHE_VERSION = 'v2'
+
+# Numero massimo di file XLIFF elaborati in parallelo
+MAX_WORKERS = 8
+
+# Nomi qualificati degli elementi XLIFF, calcolati una sola volta
+NS = '{urn:oasis:names:tc:xliff:document:1.2}'
+TAG_XLIFF = NS + 'xliff'
+TAG_FILE = NS + 'file'
+TAG_BODY = NS + 'body'
+TAG_GROUP = NS + 'group'
+TAG_TU = NS + 'trans-unit'
+TAG_SRC = NS + 'source'
+TAG_TGT = NS + 'target'
+
+# Opzioni del parser per la lettura in streaming dei file XLIFF:
+# nessuna tabella degli attributi xml:id (gli id non vengono mai cercati)
+# e blocchi di lettura più grandi del default (32 KB).
+# Le entità interne del DTD restano espanse: il DOCTYPE non viene riscritto nell'output
+ITERPARSE_OPTIONS = {
+    'huge_tree': True,
+    'collect_ids': False,
+    'chunk_size': 256 * 1024,
+}
+
+# Dimensione del buffer di scrittura dei file XLIFF tradotti
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Dichiarazione scritta in testa a ogni file XLIFF tradotto
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+
+# Elementi XLIFF che contengono altri elementi e vengono scritti in streaming
+XLIFF_CONTAINER_TAGS = {TAG_XLIFF, TAG_FILE, TAG_BODY, TAG_GROUP}
 
 # Mappatura codici lingua per Google Translate
 # Questa mappa i codici lingua di Xcode ai codici di Google Translate
@@ -97,28 +207,162 @@ class FormatSpecifierHandler:
         if not text or not placeholder_map:
             return text
 
+        # Con molti segnaposto una sola scansione del testo è più veloce di N sostituzioni
+        if len(placeholder_map) > 3:
+            pattern = re.compile('|'.join(re.escape(p) for p in placeholder_map))
+            return pattern.sub(lambda match: placeholder_map[match.group(0)], text)
+
         result = text
         for placeholder, original in placeholder_map.items():
             result = result.replace(placeholder, original)
         return result
 
 
+# Client Google Translate condiviso da tutte le istanze di Translator
+_GLOBAL_TRANSLATOR = None
+_GLOBAL_TRANSLATOR_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Limita la frequenza delle chiamate API con un secchio di gettoni condiviso tra i thread.
+    """
+
+    def __init__(self, rate_per_sec, burst):
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._slow_until = 0.0  # Fino a questo istante i gettoni si ricaricano a metà velocità
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Attende finché un gettone è disponibile e lo consuma."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                rate = self.rate_per_sec / 2 if now < self._slow_until else self.rate_per_sec
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / rate
+            time.sleep(wait)
+
+    def slow_down(self, seconds):
+        """Raddoppia l'intervallo di ricarica dei gettoni per i prossimi secondi indicati."""
+        with self._lock:
+            self._slow_until = time.monotonic() + seconds
+
+
 class Translator:
     """Gestisce la traduzione del testo usando l'API Google Translate."""
 
     def __init__(self):
         self.translator = self._create_translator()
         self.cache = {}  # Cache per evitare chiamate API ridondanti
+        self._lock = threading.Lock()  # Protegge la cache quando più file sono tradotti in parallelo
+        # Disattivato se l'API non restituisce una riga per ogni testo unito: i blocchi successivi
+        # costerebbero una richiesta sprecata più una per testo
+        self._join_batches = True
+        self.rate_limiter = TokenBucket(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST)
+        self.db = self._open_persistent_cache()
 
     def _create_translator(self):
-        """Crea e restituisce un client Google Translate."""
+        """
+        Restituisce il client Google Translate condiviso, creandolo alla prima chiamata.
+        Il client mantiene un'unica sessione HTTP, così tutte le istanze e tutti i thread
+        riutilizzano le stesse connessioni invece di ripetere l'handshake TLS.
+        """
+        global _GLOBAL_TRANSLATOR
+        with _GLOBAL_TRANSLATOR_LOCK:
+            if _GLOBAL_TRANSLATOR is None:
+                try:
+                    from googletrans import Translator as GoogleTranslator
+                    _GLOBAL_TRANSLATOR = GoogleTranslator()
+                    # googletrans 4.0.0-rc1 legge l'attributo raise_Exception senza mai definirlo:
+                    # senza di esso ogni risposta diversa da 200 diventa un AttributeError
+                    # invece dell'errore con il codice di stato
+                    _GLOBAL_TRANSLATOR.raise_Exception = True
+                except Exception as e:
+                    logger.error("Impossibile inizializzare il traduttore: %s", e)
+            return _GLOBAL_TRANSLATOR
+
+    def _open_persistent_cache(self):
+        """
+        Apre (o crea) la cache persistente su disco.
+        Restituisce None se la cache non è disponibile: la traduzione prosegue senza.
+        """
         try:
-            from googletrans import Translator as GoogleTranslator
-            return GoogleTranslator()
+            PERSISTENT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            # La connessione è condivisa tra i thread e protetta da self._lock
+            db = sqlite3.connect(str(PERSISTENT_CACHE_PATH), check_same_thread=False)
+            db.execute("CREATE TABLE IF NOT EXISTS t (k TEXT PRIMARY KEY, v TEXT)")
+            db.commit()
+            logger.info("Cache persistente delle traduzioni: %s", PERSISTENT_CACHE_PATH)
+            return db
         except Exception as e:
-            logger.error(f"Impossibile inizializzare il traduttore: {e}")
+            logger.warning("Impossibile aprire la cache persistente %s: %s", PERSISTENT_CACHE_PATH, e)
             return None
 
+    def close(self):
+        """Chiude la cache persistente su disco."""
+        with self._lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    @staticmethod
+    def _persistent_key(text, source_lang, target_lang):
+        """Calcola la chiave della cache persistente per un testo."""
+        key = f"{PERSISTENT_CACHE_VERSION}:{source_lang}|{target_lang}|{text}"
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def _cache_get(self, cache_key, text, source_lang, target_lang):
+        """
+        Cerca una traduzione nella cache in memoria e poi in quella persistente.
+        Restituisce None se il testo non è mai stato tradotto.
+        """
+        with self._lock:
+            cached = self.cache.get(cache_key)
+            if cached is None and self.db is not None:
+                try:
+                    row = self.db.execute(
+                        "SELECT v FROM t WHERE k = ?",
+                        (self._persistent_key(text, source_lang, target_lang),)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning("Lettura dalla cache persistente fallita: %s", e)
+                    row = None
+                if row is not None:
+                    cached = row[0]
+                    self.cache[cache_key] = cached
+        return cached
+
+    def _cache_put_many(self, entries, source_lang, target_lang):
+        """
+        Memorizza le traduzioni nella cache in memoria e in quella persistente.
+        entries è una lista di (chiave cache, testo originale, traduzione).
+        """
+        if not entries:
+            return
+
+        with self._lock:
+            for cache_key, _, translation in entries:
+                self.cache[cache_key] = translation
+
+            if self.db is not None:
+                try:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO t (k, v) VALUES (?, ?)",
+                        [(self._persistent_key(text, source_lang, target_lang), translation)
+                         for _, text, translation in entries]
+                    )
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.warning("Scrittura nella cache persistente fallita: %s", e)
+
     def _map_language_code(self, lang_code):
         """
         Mappa i codici lingua di Xcode ai codici lingua di Google Translate.
@@ -131,49 +375,230 @@ class Translator:
         Traduce il testo dalla lingua di origine alla lingua di destinazione.
         Gestisce i specificatori di formato e la memorizzazione nella cache.
         """
-        if not text or text.strip() == '':
-            return text
+        return self.translate_batch([text], source_lang, target_lang)[0]
 
+    def translate_prepared(self, text, google_source_lang, google_target_lang):
+        """
+        Come translate, ma con codici lingua già mappati per Google Translate.
+        """
+        return self.translate_batch_prepared([text], google_source_lang, google_target_lang)[0]
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        """
+        Traduce una lista di testi dalla lingua di origine alla lingua di destinazione,
+        raggruppandoli in blocchi per ridurre il numero di chiamate API.
+        Restituisce le traduzioni nello stesso ordine dei testi di input.
+        """
         # Mappa i codici lingua per Google Translate
-        google_source_lang = self._map_language_code(source_lang)
-        google_target_lang = self._map_language_code(target_lang)
+        return self.translate_batch_prepared(
+            texts, self._map_language_code(source_lang), self._map_language_code(target_lang)
+        )
+
+    def translate_batch_prepared(self, texts, google_source_lang, google_target_lang):
+        """
+        Come translate_batch, ma con codici lingua già mappati per Google Translate.
+        Le chiavi della cache usano i codici mappati, così lingue che Google considera
+        uguali (es. en ed en-GB) condividono le stesse traduzioni.
+        """
+        results = list(texts)
 
-        # Controlla prima la cache
-        cache_key = f"{source_lang}:{target_lang}:{text}"
-        if cache_key in self.cache:
-            logger.debug(f"Uso traduzione in cache per: {text}")
-            return self.cache[cache_key]
+        # Stessa lingua per Google Translate (es. en-GB -> en): il testo resta invariato
+        if google_source_lang == google_target_lang:
+            return results
 
-        # Estrai i specificatori di formato
         handler = FormatSpecifierHandler()
-        modified_text, placeholder_map = handler.extract_placeholders(text)
 
-        try:
-            # Se il testo contiene solo segnaposto, non tradurre
-            if all(p in placeholder_map for p in modified_text.split()):
-                return text
+        # Prima passata: dividi i testi in frasi e cerca ogni frase nella cache
+        prepared = []  # (indice, segmenti, mappa segnaposto)
+        sentences = {}  # chiave cache -> frase tradotta, None se ancora da tradurre
+        misses = []  # (chiave cache, frase) da inviare all'API, senza duplicati
+        for index, text in enumerate(texts):
+            if not text or text.strip() == '':
+                continue
+
+            # Estrai i specificatori di formato prima di dividere il testo, per preservarne l'ordine
+            modified_text, placeholder_map = handler.extract_placeholders(text)
+
+            # Se il testo contiene solo segnaposto, numeri, simboli o un URL, non tradurre
+            if self._is_untranslatable(modified_text):
+                continue
+
+            # I segmenti in posizione dispari sono gli spazi tra una frase e l'altra
+            segments = SENTENCE_SPLIT_PATTERN.split(modified_text)
+            for sentence in segments[::2]:
+                if self._is_untranslatable(sentence):
+                    continue
+
+                cache_key = f"{google_source_lang}:{google_target_lang}:{sentence}"
+                if cache_key in sentences:
+                    continue
+
+                # Controlla prima la cache
+                cached = self._cache_get(cache_key, sentence, google_source_lang, google_target_lang)
+                sentences[cache_key] = cached
+                if cached is None:
+                    misses.append((cache_key, sentence))
+                else:
+                    logger.debug("Uso traduzione in cache per: %s", sentence)
+
+            prepared.append((index, segments, placeholder_map))
+
+        # Seconda passata: traduci le frasi mancanti un blocco alla volta
+        for chunk in self._split_chunks(misses):
+            translations = self._translate_chunk(
+                [sentence for _, sentence in chunk], google_source_lang, google_target_lang
+            )
+
+            translated = []
+            for (cache_key, sentence), translation in zip(chunk, translations):
+                if translation is None:
+                    continue  # Il testo che contiene la frase resta quello originale
+                sentences[cache_key] = translation
+                translated.append((cache_key, sentence, translation))
+
+            # Memorizza i risultati nella cache, una sola scrittura su disco per blocco
+            self._cache_put_many(translated, google_source_lang, google_target_lang)
+
+        # Terza passata: ricomponi i testi dalle frasi tradotte
+        for index, segments, placeholder_map in prepared:
+            parts = []
+            for position, segment in enumerate(segments):
+                if position % 2 or self._is_untranslatable(segment):
+                    parts.append(segment)
+                    continue
+
+                translation = sentences.get(f"{google_source_lang}:{google_target_lang}:{segment}")
+                if translation is None:
+                    break  # Mantieni il testo originale in caso di errore
+                parts.append(translation)
+            else:
+                # Ripristina i specificatori di formato
+                results[index] = handler.restore_placeholders(''.join(parts), placeholder_map)
 
-            # Esegui la traduzione
-            translation = self.translator.translate(
-                modified_text,
-                src=google_source_lang,
-                dest=google_target_lang
-            ).text
+        return results
 
-            # Ripristina i specificatori di formato
-            final_translation = handler.restore_placeholders(translation, placeholder_map)
+    @staticmethod
+    def _is_untranslatable(text):
+        """
+        Indica se il testo resta identico in ogni lingua: segnaposto, numeri, simboli e spazi
+        (nessuna lettera) oppure un URL. Questi testi non vengono inviati all'API.
+        """
+        return not LETTER_PATTERN.search(text) or IDENTITY_PATTERN.fullmatch(text.strip()) is not None
 
-            # Memorizza il risultato nella cache
-            self.cache[cache_key] = final_translation
+    def _call_api(self, text, google_source_lang, google_target_lang):
+        """
+        Esegue una chiamata a Google Translate rispettando il limite di frequenza.
+        Solo gli errori temporanei (rete, risposte 429 e 5xx) vengono ritentati, con attesa
+        esponenziale; dopo una risposta 429 rallenta il limite di frequenza per tutte le
+        chiamate successive.
+        """
+        for attempt in range(MAX_RETRIES):
+            self.rate_limiter.acquire()
+            try:
+                return self.translator.translate(
+                    text,
+                    src=google_source_lang,
+                    dest=google_target_lang
+                ).text
+            except Exception as e:
+                rate_limited = self._is_rate_limited(e)
+                if not self._is_transient(e) or attempt == MAX_RETRIES - 1:
+                    raise
+                if rate_limited:
+                    logger.warning("Limite di richieste raggiunto, rallentamento delle chiamate API")
+                    self.rate_limiter.slow_down(RATE_LIMIT_PENALTY_SECONDS)
+                delay = 2 ** attempt
+                logger.warning("Chiamata API fallita (%s), nuovo tentativo tra %ds", e, delay)
+                time.sleep(delay)
 
-            # Aggiungi un piccolo ritardo per evitare limiti API
-            time.sleep(0.2)
+    @staticmethod
+    def _is_rate_limited(error):
+        """Indica se l'errore è una risposta 429 dell'API."""
+        return '429' in str(error) or 'Too Many Requests' in str(error)
 
-            return final_translation
+    @staticmethod
+    def _is_transient(error):
+        """
+        Indica se l'errore è temporaneo e la stessa chiamata potrebbe riuscire più tardi:
+        errori di rete, risposte 429 e errori del server (5xx).
+        """
+        if isinstance(error, TRANSIENT_API_ERRORS) or Translator._is_rate_limited(error):
+            return True
+        status = STATUS_CODE_PATTERN.search(str(error))
+        return status is not None and status.group(1).startswith('5')
 
-        except Exception as e:
-            logger.error(f"Traduzione fallita per il testo '{text}': {e}")
-            return text  # Restituisci il testo originale in caso di errore
+    @staticmethod
+    def _split_chunks(pending):
+        """
+        Suddivide i testi da tradurre in blocchi di al massimo BATCH_SIZE elementi
+        e BATCH_MAX_CHARS caratteri.
+        """
+        chunk = []
+        chunk_chars = 0
+        for item in pending:
+            item_chars = len(item[1]) + len(BATCH_SEPARATOR)
+            if chunk and (len(chunk) >= BATCH_SIZE or chunk_chars + item_chars > BATCH_MAX_CHARS):
+                yield chunk
+                chunk = []
+                chunk_chars = 0
+            chunk.append(item)
+            chunk_chars += item_chars
+        if chunk:
+            yield chunk
+
+    def _translate_chunk(self, texts, google_source_lang, google_target_lang):
+        """
+        Traduce un blocco di testi con una sola chiamata API.
+        I testi su più righe, o un blocco che fallisce per un errore non temporaneo o non può
+        essere separato dopo la traduzione, vengono tradotti singolarmente. Dopo un errore
+        temporaneo (già ritentato da _call_api) il resto del blocco non viene inviato.
+        Restituisce una lista con None per le traduzioni fallite.
+        """
+        translations = [None] * len(texts)
+
+        # I testi su più righe non possono essere separati in modo affidabile dopo la traduzione
+        single_line = [i for i, t in enumerate(texts) if BATCH_SEPARATOR not in t]
+        with self._lock:
+            join_batches = self._join_batches
+        if join_batches and len(single_line) > 1:
+            try:
+                translation = self._call_api(
+                    BATCH_SEPARATOR.join(texts[i] for i in single_line),
+                    google_source_lang,
+                    google_target_lang
+                )
+                parts = translation.split(BATCH_SEPARATOR)
+                if len(parts) == len(single_line):
+                    for i, part in zip(single_line, parts):
+                        translations[i] = part
+                else:
+                    with self._lock:
+                        first_mismatch, self._join_batches = self._join_batches, False
+                    if first_mismatch:
+                        logger.warning(
+                            "Il blocco di %d stringhe ha restituito %d righe: le stringhe verranno "
+                            "tradotte singolarmente per il resto dell'esecuzione",
+                            len(single_line), len(parts))
+            except Exception as e:
+                if self._is_transient(e):
+                    # Rete o API non disponibili: le singole chiamate fallirebbero allo stesso modo.
+                    # I testi restano originali e saranno tradotti alla prossima esecuzione
+                    logger.error("Traduzione fallita per un blocco di %d stringhe: %s", len(single_line), e)
+                    return translations
+                # Un solo testo problematico non deve far perdere le traduzioni degli altri
+                logger.warning("Traduzione fallita per un blocco di %d stringhe (%s), "
+                               "traduzione delle singole stringhe", len(single_line), e)
+
+        for i, text in enumerate(texts):
+            if translations[i] is not None:
+                continue
+            try:
+                translations[i] = self._call_api(text, google_source_lang, google_target_lang)
+            except Exception as e:
+                logger.error("Traduzione fallita per il testo '%s': %s", text, e)
+                if self._is_transient(e):
+                    break
+        return translations
 
 
 class XliffTranslator:
@@ -183,116 +608,345 @@ class XliffTranslator:
         self.translator = translator
         self.source_lang = source_lang
         self.target_lang = target_lang
+        # Codici lingua per Google Translate, costanti per tutta la durata dell'istanza
+        self.g_src = LANGUAGE_CODE_MAPPING.get(source_lang, source_lang)
+        self.g_tgt = LANGUAGE_CODE_MAPPING.get(target_lang, target_lang)
 
     def translate_file(self, input_path, output_path):
         """
         Traduce un file XLIFF e salva la versione tradotta.
+        Il file viene letto e scritto in streaming: in memoria restano solo gli elementi
+        contenitore aperti e le unità in attesa di traduzione.
+        Restituisce (successo, coerente): coerente è True se tutti gli elementi file
+        sono stati scritti con il target-language corretto.
         """
-        logger.info(f"Traduzione file XLIFF: {input_path}")
+        logger.info("Traduzione file XLIFF: %s", input_path)
+
+        # Il file viene scritto in un file temporaneo nella stessa directory e sostituito
+        # all'output solo a scrittura completata: in caso di errore l'output resta la copia
+        # intatta dell'input. La sostituzione rompe anche l'eventuale collegamento fisico all'input
+        output_dir = os.path.dirname(output_path)
+        temp_path = os.path.join(
+            output_dir, f".{os.path.basename(output_path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
 
         try:
-            # Analizza il file XLIFF
-            tree = ET.parse(input_path)
-            root = tree.getroot()
-
-            # Aggiorna l'attributo target-language negli elementi file
-            # Utilizziamo il target_lang originale (non la versione mappata di Google Translate)
-            # per mantenere la coerenza con i nomi di cartella .lproj e contents.json
-            file_elements_updated = 0
-            for file_elem in root.findall('.//{urn:oasis:names:tc:xliff:document:1.2}file'):
-                current_target = file_elem.get('target-language', '')
-                if current_target != self.target_lang:
-                    logger.info(f"Aggiornamento target-language da '{current_target}' a '{self.target_lang}'")
-                    file_elem.set('target-language', self.target_lang)
-                    file_elements_updated += 1
-
-            logger.info(f"Aggiornato attributo target-language in {file_elements_updated} elementi file")
-
-            # Verifica che tutti gli elementi file abbiano l'attributo target-language corretto
-            for file_elem in root.findall('.//{urn:oasis:names:tc:xliff:document:1.2}file'):
-                if file_elem.get('target-language', '') != self.target_lang:
-                    logger.warning(
-                        f"L'elemento file ha ancora un target-language non corretto: {file_elem.get('target-language', '')}")
-                    # Forza l'aggiornamento dell'attributo
-                    file_elem.set('target-language', self.target_lang)
-
-            # Ottieni tutte le unità di traduzione
-            trans_units = root.findall('.//{urn:oasis:names:tc:xliff:document:1.2}trans-unit')
+            os.makedirs(output_dir, exist_ok=True)
 
             # Conteggio per il logging
-            total_units = len(trans_units)
-            translated_count = 0
-
-            # Elabora ogni unità di traduzione
-            for unit in trans_units:
-                source = unit.find('.//{urn:oasis:names:tc:xliff:document:1.2}source')
-                target = unit.find('.//{urn:oasis:names:tc:xliff:document:1.2}target')
-
-                if source is not None:
-                    source_text = source.text or ""
-
-                    # Crea elemento target se non esiste
-                    if target is None:
-                        target = ET.SubElement(unit, '{urn:oasis:names:tc:xliff:document:1.2}target')
-
-                    # Ottieni lo stato corrente
-                    current_state = target.get('state', '')
-
-                    # Traduci solo se necessario
-                    if target.text is None or target.text.strip() == '' or current_state != 'translated':
-                        logger.info(f"Originale: {source_text}")
-                        translated_text = self.translator.translate(
-                            source_text, self.source_lang, self.target_lang
-                        )
-                        logger.info(f"Tradotto: {translated_text}")
-
-                        # Aggiorna target
-                        target.text = translated_text
-                        target.set('state', 'translated')
-                        translated_count += 1
-
-            # Scrivi il file tradotto
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            tree.write(output_path, encoding='utf-8', xml_declaration=True)
-
-            logger.info(f"Tradotte {translated_count} su {total_units} stringhe in {input_path}")
-            return True
+            stats = {'total': 0, 'translated': 0, 'files_updated': 0, 'consistent': True}
+
+            # Un buffer grande raccoglie i tanti piccoli write dei nodi: il file viene scritto
+            # con poche chiamate di sistema, senza tenere in memoria l'intero output
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            with open(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as output_file:
+                output_file.write(XML_DECLARATION)
+                self._stream_translate(input_path, output_file, stats)
+
+            os.replace(temp_path, output_path)
+
+            logger.info("Aggiornato attributo target-language in %d elementi file", stats['files_updated'])
+            logger.info("Tradotte %d su %d stringhe in %s", stats['translated'], stats['total'], input_path)
+            return True, stats['consistent']
 
         except Exception as e:
-            logger.error(f"Errore nella traduzione del file XLIFF {input_path}: {e}")
-            return False
+            logger.error("Errore nella traduzione del file XLIFF %s: %s", input_path, e)
+            try:
+                if os.path.lexists(temp_path):
+                    os.remove(temp_path)
+            except OSError as cleanup_error:
+                logger.error("Impossibile rimuovere il file temporaneo %s: %s", temp_path, cleanup_error)
+            return False, False
+
+    def _stream_translate(self, input_path, output_file, stats):
+        """
+        Analizza il file XLIFF con iterparse e scrive ogni nodo appena è completo.
+        Degli elementi contenitore (xliff, file, body, group) vengono scritti separatamente
+        i tag di apertura e di chiusura, tutti gli altri elementi vengono scritti interi
+        e poi rimossi dall'albero.
+        """
+        open_elements = []  # (elemento contenitore, tag di chiusura serializzato)
+        write_queue = []  # Testo, byte e nodi in attesa di essere scritti, in ordine di documento
+        pending = []  # (elemento target, testo originale) da tradurre prima di svuotare la coda
+        root_closed = False
+
+        events = ET.iterparse(input_path, events=('start', 'end', 'comment', 'pi'), **ITERPARSE_OPTIONS)
+        for event, elem in events:
+            parent = elem.getparent()
+
+            if event == 'end' and open_elements and elem is open_elements[-1][0]:
+                # Fine di un contenitore: accoda gli spazi prima del tag di chiusura
+                last_child = elem[-1] if len(elem) else None
+                write_queue.append(last_child.tail if last_child is not None else elem.text)
+                write_queue.append(open_elements.pop()[1])
+                self._flush_queue(output_file, write_queue, pending, stats)
+                self._release(elem)
+                root_closed = parent is None
+                continue
+
+            # Ignora i discendenti degli elementi che vengono scritti interi (es. source e target)
+            if parent is not None and (not open_elements or parent is not open_elements[-1][0]):
+                continue
+
+            if event == 'end':
+                if elem.tag == TAG_TU:
+                    self._collect_unit(elem, pending, stats)
+                write_queue.append(elem)
+                # Senza unità da tradurre la coda viene scritta subito; altrimenti si attende
+                # un blocco completo, entro un limite che contiene la memoria usata dalla coda
+                if not pending or len(pending) >= BATCH_SIZE or len(write_queue) >= WRITE_QUEUE_LIMIT:
+                    self._flush_queue(output_file, write_queue, pending, stats)
+                continue
+
+            # Eventi start, comment e pi: accoda gli spazi che precedono il nodo
+            if parent is not None:
+                previous = elem.getprevious()
+                write_queue.append(previous.tail if previous is not None else parent.text)
+
+            if event != 'start':
+                # Commenti e istruzioni fuori dalla radice vanno a capo come nella serializzazione di lxml
+                if parent is None and root_closed:
+                    write_queue.append(b'\n')
+                write_queue.append(elem)
+                if parent is None and not root_closed:
+                    write_queue.append(b'\n')
+                if not pending:
+                    self._flush_queue(output_file, write_queue, pending, stats)
+            elif elem.tag in XLIFF_CONTAINER_TAGS:
+                if elem.tag == TAG_FILE:
+                    self._update_target_language(elem, stats)
+                    # Verifica l'attributo così come viene scritto, senza rileggere il file
+                    if elem.get('target-language') != self.target_lang:
+                        stats['consistent'] = False
+                start_tag, end_tag = self._container_tags(elem)
+                write_queue.append(start_tag)
+                self._flush_queue(output_file, write_queue, pending, stats)
+                open_elements.append((elem, end_tag))
+
+    @staticmethod
+    def _container_tags(elem):
+        """
+        Restituisce i tag di apertura e di chiusura serializzati di un elemento contenitore,
+        con i soli attributi dell'elemento e le dichiarazioni di namespace che introduce.
+        """
+        shell = ET.Element(elem.tag, dict(elem.attrib), nsmap=elem.nsmap)
+        shell.text = ''  # Forza la forma <tag></tag> invece di <tag/>
+        data = ET.tostring(shell, encoding='utf-8')
+        split = data.rindex(b'</')
+        return XliffTranslator._strip_inherited_namespaces(data[:split], elem), data[split:]
+
+    @staticmethod
+    def _serialize(node):
+        """
+        Serializza un nodo senza la coda di testo. lxml ripete sul nodo tutte le dichiarazioni
+        di namespace ereditate dagli antenati: quelle già dichiarate nel file vengono rimosse.
+        """
+        data = ET.tostring(node, encoding='utf-8', with_tail=False)
+        if isinstance(node.tag, str):
+            data = XliffTranslator._strip_inherited_namespaces(data, node)
+        return data
+
+    @staticmethod
+    def _strip_inherited_namespaces(data, elem):
+        """
+        Rimuove dal tag di apertura in data le dichiarazioni di namespace già in vigore
+        nel genitore di elem.
+        """
+        parent = elem.getparent()
+        match = START_TAG_NAMESPACES_PATTERN.match(data)
+        if parent is None or match is None or not match.group(1):
+            return data
+
+        inherited = parent.nsmap
+
+        def keep_declaration(declaration):
+            prefix = declaration.group(1).decode('utf-8') if declaration.group(1) else None
+            uri = unescape(declaration.group(2).decode('utf-8'), {'&quot;': '"'})
+            return b'' if inherited.get(prefix) == uri else declaration.group(0)
+
+        declarations = NAMESPACE_DECLARATION_PATTERN.sub(keep_declaration, match.group(1))
+        return data[:match.start(1)] + declarations + data[match.end(1):]
+
+    def _update_target_language(self, file_elem, stats):
+        """
+        Aggiorna l'attributo target-language di un elemento file.
+        Utilizziamo il target_lang originale (non la versione mappata di Google Translate)
+        per mantenere la coerenza con i nomi di cartella .lproj e contents.json
+        """
+        current_target = file_elem.get('target-language', '')
+        if current_target != self.target_lang:
+            logger.info("Aggiornamento target-language da '%s' a '%s'", current_target, self.target_lang)
+            file_elem.set('target-language', self.target_lang)
+            stats['files_updated'] += 1
+
+    def _collect_unit(self, unit, pending, stats):
+        """
+        Prepara un'unità di traduzione e la aggiunge a quelle da tradurre se necessario.
+        """
+        stats['total'] += 1
+
+        # source e target sono figli diretti (quelli in alt-trans non vanno toccati)
+        source = unit.find(TAG_SRC)
+        target = unit.find(TAG_TGT)
+
+        if source is not None:
+            source_text = source.text or ""
+
+            # Crea elemento target se non esiste
+            if target is None:
+                target = ET.SubElement(unit, TAG_TGT)
+
+            # Ottieni lo stato corrente
+            current_state = target.get('state', '')
+
+            # Traduci solo se necessario
+            if target.text is None or target.text.strip() == '' or current_state != 'translated':
+                pending.append((target, source_text))
+
+    def _flush_queue(self, output_file, write_queue, pending, stats):
+        """
+        Traduce in blocco le unità in attesa e scrive nel file tutto il contenuto accodato.
+        """
+        if pending:
+            # Traduci ogni testo una sola volta anche se compare in più unità
+            source_texts = list(dict.fromkeys(source_text for _, source_text in pending))
+            if self.g_src == self.g_tgt:
+                # Stessa lingua: il target è una copia del source
+                translations = source_texts
+            else:
+                translations = self.translator.translate_batch_prepared(
+                    source_texts, self.g_src, self.g_tgt
+                )
+            translations = dict(zip(source_texts, translations))
+
+            for target, source_text in pending:
+                translated_text = translations[source_text]
+                logger.debug("Originale: %s", source_text)
+                logger.debug("Tradotto: %s", translated_text)
+
+                # Aggiorna target
+                target.text = translated_text
+                target.set('state', 'translated')
+                stats['translated'] += 1
+
+            pending.clear()
+
+        for item in write_queue:
+            if isinstance(item, str):
+                output_file.write(escape(item).encode('utf-8'))
+            elif isinstance(item, bytes):
+                output_file.write(item)
+            elif item is not None:
+                output_file.write(self._serialize(item))
+                self._release(item)
+        write_queue.clear()
+
+    @staticmethod
+    def _release(elem):
+        """
+        Libera la memoria di un elemento già scritto e dei fratelli che lo precedono.
+        La coda di testo viene mantenuta perché precede il nodo successivo non ancora letto.
+        """
+        elem.clear(keep_tail=True)
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
 
 
 def verify_xliff_consistency(xliff_path, target_lang):
     """
     Verifica che tutti gli elementi file in un file XLIFF abbiano il target-language corretto.
-    Restituisce True se coerente, False se sono state trovate incoerenze.
+    Restituisce True se coerente, False se sono state trovate incoerenze
+    o se il file non contiene elementi file (ad esempio perché non è XLIFF valido).
+    Gli elementi file vengono cercati direttamente nei byte del file, senza analizzare l'XML.
     """
     try:
-        tree = ET.parse(xliff_path)
-        root = tree.getroot()
+        with open(xliff_path, 'rb') as f:
+            content = f.read()
+
+        file_tags = FILE_TAG_PATTERN.findall(content)
+        if not file_tags:
+            logger.warning("Nessun elemento file trovato in %s", xliff_path)
+            return False
 
         inconsistent_files = []
-        for file_elem in root.findall('.//{urn:oasis:names:tc:xliff:document:1.2}file'):
-            current_target = file_elem.get('target-language', '')
-            original_attr = file_elem.get('original', '(sconosciuto)')
+        for file_tag in file_tags:
+            match = TARGET_LANGUAGE_ATTR_PATTERN.search(file_tag)
+            current_target = match.group(1).decode('utf-8') if match else ''
+            match = ORIGINAL_ATTR_PATTERN.search(file_tag)
+            original_attr = match.group(1).decode('utf-8') if match else '(sconosciuto)'
 
             if current_target != target_lang:
                 inconsistent_files.append((original_attr, current_target))
 
         if inconsistent_files:
-            logger.warning(f"Trovati {len(inconsistent_files)} elementi file incoerenti in {xliff_path}:")
+            logger.warning("Trovati %d elementi file incoerenti in %s:", len(inconsistent_files), xliff_path)
             for orig, lang in inconsistent_files:
-                logger.warning(f"  File '{orig}' ha target-language='{lang}', dovrebbe essere '{target_lang}'")
+                logger.warning("  File '%s' ha target-language='%s', dovrebbe essere '%s'", orig, lang, target_lang)
             return False
 
         return True
 
     except Exception as e:
-        logger.error(f"Errore nella verifica della coerenza XLIFF in {xliff_path}: {e}")
+        logger.error("Errore nella verifica della coerenza XLIFF in %s: %s", xliff_path, e)
         return False
 
 
+def load_json(path):
+    """Legge un file JSON, con orjson se disponibile."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_json(data, path):
+    """Scrive un file JSON indentato di 2 spazi in UTF-8, con orjson se disponibile."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def _link_or_copy(src, dst):
+    """
+    Crea un collegamento fisico a src in dst, oppure lo copia se il collegamento non è possibile
+    (es. filesystem diversi o filesystem che non supportano i collegamenti fisici).
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def _iter_xliff(root):
+    """
+    Restituisce ricorsivamente i percorsi dei file XLIFF sotto root.
+    os.scandir fornisce nome e tipo di ogni voce senza chiamate stat aggiuntive.
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_xliff(entry.path)
+            elif entry.name.endswith('.xliff') and entry.is_file():
+                yield entry.path
+
+
+def _break_hard_link(path):
+    """
+    Rimuove un file di output prima di riscriverlo.
+    I file di output possono essere collegamenti fisici ai file di input:
+    scriverci sopra direttamente modificherebbe anche il bundle originale.
+    """
+    if os.path.lexists(path):
+        os.remove(path)
+
+
 class XclocBundle:
     """Gestisce le operazioni su un bundle di localizzazione Xcode."""
 
@@ -315,27 +969,26 @@ class XclocBundle:
         """
         # Controlla se l'input esiste
         if not os.path.exists(self.input_path):
-            logger.error(f"Il percorso di input non esiste: {self.input_path}")
+            logger.error("Il percorso di input non esiste: %s", self.input_path)
             return False
 
         # Controlla se contents.json esiste
         if not os.path.exists(self.contents_json_path):
-            logger.error(f"contents.json non trovato in {self.input_path}")
+            logger.error("contents.json non trovato in %s", self.input_path)
             return False
 
         # Analizza contents.json
         try:
-            with open(self.contents_json_path, 'r', encoding='utf-8') as f:
-                contents = json.load(f)
-                self.source_lang = contents.get('developmentRegion', '')
+            contents = load_json(self.contents_json_path)
+            self.source_lang = contents.get('developmentRegion', '')
 
-                if not self.source_lang:
-                    logger.error("Lingua di origine non trovata in contents.json")
-                    return False
+            if not self.source_lang:
+                logger.error("Lingua di origine non trovata in contents.json")
+                return False
 
-                logger.info(f"Lingua di origine: {self.source_lang}")
+            logger.info("Lingua di origine: %s", self.source_lang)
         except Exception as e:
-            logger.error(f"Errore nella lettura di contents.json: {e}")
+            logger.error("Errore nella lettura di contents.json: %s", e)
             return False
 
         # Inizializza il traduttore
@@ -347,13 +1000,12 @@ class XclocBundle:
             if os.path.exists(self.output_path):
                 shutil.rmtree(self.output_path)
 
-            # Copia l'intera directory di input in output
-            shutil.copytree(self.input_path, self.output_path)
+            # Copia l'intera directory di input in output, usando collegamenti fisici dove possibile
+            shutil.copytree(self.input_path, self.output_path, copy_function=_link_or_copy)
 
             # Aggiorna contents.json in output
             output_contents_path = os.path.join(self.output_path, 'contents.json')
-            with open(output_contents_path, 'r', encoding='utf-8') as f:
-                contents = json.load(f)
+            contents = load_json(output_contents_path)
 
             # Memorizza la locale di destinazione originale se esiste
             original_target = contents.get('targetLocale', '')
@@ -361,16 +1013,16 @@ class XclocBundle:
             # Aggiorna con la nuova locale di destinazione
             contents['targetLocale'] = self.target_lang
 
-            with open(output_contents_path, 'w', encoding='utf-8') as f:
-                json.dump(contents, f, indent=2, ensure_ascii=False)
+            _break_hard_link(output_contents_path)
+            dump_json(contents, output_contents_path)
 
             if original_target and original_target != self.target_lang:
-                logger.info(f"Aggiornata contents.json target locale da '{original_target}' a '{self.target_lang}'")
+                logger.info("Aggiornata contents.json target locale da '%s' a '%s'", original_target, self.target_lang)
             else:
-                logger.info(f"Aggiornata contents.json con target locale: '{self.target_lang}'")
+                logger.info("Aggiornata contents.json con target locale: '%s'", self.target_lang)
 
         except Exception as e:
-            logger.error(f"Errore nella configurazione della struttura di output: {e}")
+            logger.error("Errore nella configurazione della struttura di output: %s", e)
             return False
 
         # Elabora i file XLIFF
@@ -378,34 +1030,49 @@ class XclocBundle:
 
         # Trova tutti i file XLIFF
         xliff_files = []
-        for root, _, files in os.walk(self.input_path):
-            for file in files:
-                if file.endswith('.xliff'):
-                    input_file = os.path.join(root, file)
-                    # Crea il percorso di output corrispondente
-                    rel_path = os.path.relpath(input_file, self.input_path)
-                    output_file = os.path.join(self.output_path, rel_path)
-                    xliff_files.append((input_file, output_file))
+        for input_file in _iter_xliff(self.input_path):
+            # Crea il percorso di output corrispondente
+            rel_path = os.path.relpath(input_file, self.input_path)
+            output_file = os.path.join(self.output_path, rel_path)
+            xliff_files.append((input_file, output_file))
 
-        # Elabora i file XLIFF
+        # Elabora i file XLIFF in parallelo: la traduzione è limitata dalla rete
         success = True
-        for input_file, output_file in xliff_files:
-            if not xliff_translator.translate_file(input_file, output_file):
-                success = False
+        verified = set()  # File di output già verificati durante la scrittura
+        failed = set()  # File di output rimasti copie dell'input perché la traduzione è fallita
+        if xliff_files:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(xliff_files))) as executor:
+                results = list(executor.map(lambda paths: xliff_translator.translate_file(*paths), xliff_files))
+            success = all(ok for ok, _ in results)
+            verified = {
+                os.path.normpath(output_file)
+                for (_, output_file), (ok, consistent) in zip(xliff_files, results)
+                if ok and consistent
+            }
+            failed = {
+                os.path.normpath(output_file)
+                for (_, output_file), (ok, _) in zip(xliff_files, results)
+                if not ok
+            }
+
+        # Le traduzioni sono già salvate su disco, la cache persistente non serve più
+        self.translator.close()
 
         # Esegui una verifica aggiuntiva su tutti i file XLIFF per garantire la coerenza
         logger.info("Esecuzione della verifica finale della coerenza della lingua di destinazione XLIFF...")
         for _, output_file in xliff_files:
+            if os.path.normpath(output_file) in verified:
+                continue
             if not verify_xliff_consistency(output_file, self.target_lang):
-                logger.warning(f"La verifica XLIFF ha trovato incoerenze in {output_file}")
+                logger.warning("La verifica XLIFF ha trovato incoerenze in %s", output_file)
                 # Prova un altro tentativo di correzione diretta
                 try:
                     self._force_fix_xliff_target_language(output_file)
                 except Exception as e:
-                    logger.error(f"Impossibile forzare la correzione della lingua di destinazione XLIFF: {e}")
+                    logger.error("Impossibile forzare la correzione della lingua di destinazione XLIFF: %s", e)
 
         # Verifica finale della coerenza dell'intero bundle
-        self._verify_bundle_consistency()
+        self._verify_bundle_consistency(verified, failed)
 
         return success
 
@@ -414,65 +1081,73 @@ class XclocBundle:
         Forza la correzione dell'attributo target-language in tutti gli elementi file.
         Questo è un metodo di ultima risorsa per garantire la coerenza.
         """
-        logger.info(f"Forzatura della correzione della lingua di destinazione in {xliff_path}")
+        logger.info("Forzatura della correzione della lingua di destinazione in %s", xliff_path)
 
         try:
+            replacement = f'target-language="{self.target_lang}"'
+
             # Usa l'analisi XML grezza per modificare direttamente il file
-            with open(xliff_path, 'r', encoding='utf-8') as f:
+            with open(xliff_path, 'r+', encoding='utf-8') as f:
                 content = f.read()
 
-            # Usa regex per sostituire tutti gli attributi target-language
-            pattern = r'target-language="[^"]*"'
-            replacement = f'target-language="{self.target_lang}"'
-            new_content = re.sub(pattern, replacement, content)
+                # Usa regex per sostituire tutti gli attributi target-language
+                new_content = TARGET_LANGUAGE_PATTERN.sub(replacement, content)
 
-            # Scrivi di nuovo il contenuto corretto
-            with open(xliff_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
+                # Scrivi di nuovo il contenuto corretto nello stesso file aperto
+                if os.fstat(f.fileno()).st_nlink == 1:
+                    f.seek(0)
+                    f.write(new_content)
+                    f.truncate()
+                    new_content = None
 
-            logger.info(f"Correzione forzata della lingua di destinazione completata con successo in {xliff_path}")
+            # Il file è ancora un collegamento fisico all'input: scrivi su un nuovo file
+            if new_content is not None:
+                _break_hard_link(xliff_path)
+                with open(xliff_path, 'w', encoding='utf-8') as f:
+                    f.write(new_content)
+
+            logger.info("Correzione forzata della lingua di destinazione completata con successo in %s", xliff_path)
         except Exception as e:
-            logger.error(f"Errore durante la correzione forzata di {xliff_path}: {e}")
+            logger.error("Errore durante la correzione forzata di %s: %s", xliff_path, e)
             raise
 
-    def _verify_bundle_consistency(self):
+    def _verify_bundle_consistency(self, verified=frozenset(), failed=frozenset()):
         """
         Esegue una verifica finale dell'intero bundle per garantire la coerenza
         tra contents.json e i file XLIFF.
+        I file XLIFF in verified (percorsi normalizzati) sono già stati verificati
+        durante la scrittura e non vengono riletti; quelli in failed non sono stati tradotti.
         """
         logger.info("Esecuzione della verifica finale della coerenza del bundle...")
 
         try:
             # 1. Controlla contents.json
             contents_path = os.path.join(self.output_path, 'contents.json')
-            with open(contents_path, 'r', encoding='utf-8') as f:
-                contents = json.load(f)
+            contents = load_json(contents_path)
 
             contents_target = contents.get('targetLocale', '')
             if contents_target != self.target_lang:
-                logger.error(f"contents.json targetLocale è '{contents_target}', dovrebbe essere '{self.target_lang}'")
+                logger.error("contents.json targetLocale è '%s', dovrebbe essere '%s'", contents_target, self.target_lang)
                 # Correggilo
                 contents['targetLocale'] = self.target_lang
-                with open(contents_path, 'w', encoding='utf-8') as f:
-                    json.dump(contents, f, indent=2, ensure_ascii=False)
+                _break_hard_link(contents_path)
+                dump_json(contents, contents_path)
                 logger.info("Corretta targetLocale in contents.json")
 
             # 2. Controlla tutti i file XLIFF un'ultima volta
-            xliff_files = []
-            for root, _, files in os.walk(self.output_path):
-                for file in files:
-                    if file.endswith('.xliff'):
-                        xliff_files.append(os.path.join(root, file))
-
-            for xliff_path in xliff_files:
+            for xliff_path in _iter_xliff(self.output_path):
+                if os.path.normpath(xliff_path) in verified:
+                    continue
+                if os.path.normpath(xliff_path) in failed:
+                    logger.error("CONTROLLO FINALE: %s non è stato tradotto, contiene ancora l'originale!", xliff_path)
                 if not verify_xliff_consistency(xliff_path, self.target_lang):
                     # Se ancora incoerente dopo tutte le correzioni, registra un forte avviso
-                    logger.error(f"CONTROLLO FINALE: {xliff_path} ha ancora incoerenze nel target-language!")
+                    logger.error("CONTROLLO FINALE: %s ha ancora incoerenze nel target-language!", xliff_path)
 
             logger.info("Verifica della coerenza del bundle completata")
 
         except Exception as e:
-            logger.error(f"Errore durante la verifica della coerenza del bundle: {e}")
+            logger.error("Errore durante la verifica della coerenza del bundle: %s", e)
             # Questo è un passaggio di verifica, quindi non è necessario generare l'eccezione
 
 
@@ -490,9 +1165,9 @@ def validate_language_code(lang_code):
     ]
 
     if lang_code not in valid_codes:
-        logger.warning(f"Il codice lingua '{lang_code}' non è un codice lingua standard di Xcode.")
+        logger.warning("Il codice lingua '%s' non è un codice lingua standard di Xcode.", lang_code)
         logger.warning("Questo potrebbe causare problemi con il sistema di localizzazione di Xcode.")
-        logger.warning(f"I codici lingua comuni di Xcode includono: {', '.join(valid_codes[:10])}...")
+        logger.warning("I codici lingua comuni di Xcode includono: %s...", ', '.join(valid_codes[:10]))
 
     return lang_code
 
@@ -518,10 +1193,10 @@ def main():
     success = bundle.process()
 
     if success:
-        logger.info(f"Elaborazione completata con successo da {args.input} a {args.output}")
+        logger.info("Elaborazione completata con successo da %s a %s", args.input, args.output)
         return 0
     else:
-        logger.error(f"Impossibile elaborare {args.input}")
+        logger.error("Impossibile elaborare %s", args.input)
         return 1
 
 